@@ -1,13 +1,44 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import find_peaks
-from scipy.misc import electrocardiogram
+from numba import get_num_threads
+
+from peak_kernels import (
+    enforce_min_distance,
+    find_local_maxima_parallel,
+    local_maxima_mask,
+    peak_prominences,
+    peak_widths,
+)
+
+# Floating point dtypes the compiled kernels accept, besides integer types
+SUPPORTED_FLOAT_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# Signals at least this long are scanned for peaks on all Numba threads
+PARALLEL_MIN_SIZE = 1 << 20
+
+
+def _check_kernel_dtype(dtype):
+    if dtype not in SUPPORTED_FLOAT_DTYPES and dtype.kind not in "iu":
+        raise ValueError(
+            f"Unsupported dtype {dtype}; use float32, float64 or an integer type"
+        )
 
 
 class PeakDetector:
     def __init__(
-        self, signal, threshold=0, min_distance=1, prominence=None, width=None
+        self,
+        signal,
+        threshold=0,
+        min_distance=1,
+        prominence=None,
+        width=None,
+        dtype=None,
     ):
+        # np.float32, or an integer type such as np.int16 for raw ADC samples,
+        # cuts the memory traffic of the detection stencil
+        if dtype is not None:
+            dtype = np.dtype(dtype)
+            _check_kernel_dtype(dtype)
+            signal = np.asarray(signal, dtype=dtype)
         self.signal = signal
         self.threshold = threshold
         self.min_distance = min_distance
@@ -15,72 +46,65 @@ class PeakDetector:
         self.width = width
 
     def detect_peaks(self):
-        peaks = []
-        peak_properties = {"heights": [], "prominences": [], "widths": []}
-
         # Step 1: Initial Peak Detection
-        for i in range(1, len(self.signal) - 1):
-            if (
-                self.signal[i] > self.signal[i - 1] + self.threshold
-                and self.signal[i] > self.signal[i + 1] + self.threshold
-            ):
-                peaks.append(i)
+        s = self._kernel_signal()
+        threshold = self.threshold
+        if np.issubdtype(s.dtype, np.floating):
+            # Compare in the signal's precision rather than promoting to float64
+            threshold = s.dtype.type(threshold)
+        if s.size >= PARALLEL_MIN_SIZE:
+            peaks = find_local_maxima_parallel(s, threshold, get_num_threads())
+        else:
+            mask = local_maxima_mask(s, threshold, np.zeros(s.size, dtype=np.bool_))
+            peaks = np.flatnonzero(mask)
 
         # Step 2: Enforce minimum distance between peaks
         peaks = self._enforce_min_distance(peaks, self.min_distance)
 
         # Step 3: Calculate properties of the peaks
-        for peak in peaks:
-            height = self.signal[peak]
-            prom = (
-                self._calculate_prominence(peak)
-                if self.prominence is not None
-                else None
-            )
-            w = self._calculate_width(peak) if self.width is not None else None
-
-            # Filter based on prominence and width
-            if self.prominence is not None and prom < self.prominence:
-                continue
-            if self.width is not None and w < self.width:
-                continue
-
-            peak_properties["heights"].append(height)
-            peak_properties["prominences"].append(prom)
-            peak_properties["widths"].append(w)
+        prominences = (
+            self._calculate_prominences(s, peaks)
+            if self.prominence is not None
+            else None
+        )
+        widths = (
+            self._calculate_widths(s, peaks) if self.width is not None else None
+        )
+
+        # Filter based on prominence and width
+        keep = np.ones(len(peaks), dtype=np.bool_)
+        if prominences is not None:
+            keep &= prominences >= self.prominence
+        if widths is not None:
+            keep &= widths >= self.width
+        peaks = peaks[keep]
+
+        peak_properties = {
+            "heights": s[peaks],
+            "prominences": prominences[keep] if prominences is not None else None,
+            "widths": widths[keep] if widths is not None else None,
+        }
 
         return peaks, peak_properties
 
+    def _kernel_signal(self):
+        # Bring the signal into a form the compiled kernels can run on
+        s = np.asarray(self.signal)
+        if s.dtype == np.float16:
+            s = s.astype(np.float32)
+        if not s.dtype.isnative:
+            s = s.astype(s.dtype.newbyteorder("="))
+        _check_kernel_dtype(s.dtype)
+        return s
+
     def _enforce_min_distance(self, peaks, min_distance):
-        if len(peaks) <= 1:
+        # Peak indices are strictly increasing, so a distance of 1 always holds
+        if len(peaks) <= 1 or min_distance <= 1:
             return peaks
-        peaks_filtered = [peaks[0]]
-        for i in range(1, len(peaks)):
-            if peaks[i] - peaks_filtered[-1] >= min_distance:
-                peaks_filtered.append(peaks[i])
-        return peaks_filtered
-
-    def _calculate_prominence(self, peak):
-        left_base, right_base = peak, peak
-        while left_base > 0 and self.signal[left_base] <= self.signal[left_base - 1]:
-            left_base -= 1
-        while (
-            right_base < len(self.signal) - 1
-            and self.signal[right_base] <= self.signal[right_base + 1]
-        ):
-            right_base += 1
-        left_min = np.min(self.signal[left_base : peak + 1])
-        right_min = np.min(self.signal[peak : right_base + 1])
-        min_height = max(left_min, right_min)
-        return self.signal[peak] - min_height
-
-    def _calculate_width(self, peak):
-        peak_height = self.signal[peak]
-        half_height = (peak_height + self.threshold) / 2
-        left_idx = peak
-        right_idx = peak
-        while left_idx > 0 and self.signal[left_idx] > half_height:
-            left_idx -= 1
-        while right_idx < len(self.signal) - 1 and self.signal[right_idx] > half_height:
-            right_idx += 1
-        return right_idx - left_idx
+        return enforce_min_distance(peaks, min_distance)
+
+    def _calculate_prominences(self, s, peaks):
+        return peak_prominences(s, peaks)
+
+    def _calculate_widths(self, s, peaks):
+        return peak_widths(s, peaks, self.threshold)
@@ -0,0 +1,475 @@
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def local_maxima_mask(s, threshold, mask):
+    """
+    Flag samples that exceed both neighbours by more than `threshold`.
+
+    The loop has no data-dependent branches or stores, so it compiles to
+    vector compare and mask instructions. Peak indices are recovered
+    afterwards with `np.flatnonzero`. A zero threshold, the default, takes
+    a separate loop that skips adding it to the neighbours.
+
+    Parameters
+    ----------
+    s : ndarray
+        The 1D signal to search.
+    threshold : float
+        Minimum height difference between a sample and its neighbours.
+    mask : ndarray
+        Boolean buffer of the same size as `s`. Only its interior is written,
+        so the first and last entries must already be False.
+
+    Returns
+    -------
+    mask : ndarray
+        The `mask` buffer, True at every peak.
+    """
+    if threshold == 0:
+        for i in range(1, s.size - 1):
+            mask[i] = (s[i] > s[i - 1]) & (s[i] > s[i + 1])
+    else:
+        for i in range(1, s.size - 1):
+            mask[i] = (s[i] > s[i - 1] + threshold) & (s[i] > s[i + 1] + threshold)
+    return mask
+
+
+@njit(cache=True, nogil=True, boundscheck=False, parallel=True)
+def find_local_maxima_parallel(s, threshold, n_chunks):
+    """
+    Find the indices of the peaks flagged by `local_maxima_mask` in parallel.
+
+    The signal is split into `n_chunks` contiguous chunks. Peaks are first
+    counted per chunk, a prefix sum over the counts gives each chunk its
+    offset in the output, and a second pass writes the indices in place.
+
+    Parameters
+    ----------
+    s : ndarray
+        The 1D signal to search.
+    threshold : float
+        Minimum height difference between a sample and its neighbours.
+    n_chunks : int
+        Number of chunks to process in parallel, at least 1.
+
+    Returns
+    -------
+    peaks : ndarray
+        Indices of the peaks in ascending order.
+    """
+    n = s.size
+    chunk = (n + n_chunks - 1) // n_chunks
+    counts = np.zeros(n_chunks + 1, dtype=np.intp)
+
+    for c in prange(n_chunks):
+        lo = max(1, c * chunk)
+        hi = min(n - 1, (c + 1) * chunk)
+        k = 0
+        if threshold == 0:
+            for i in range(lo, hi):
+                k += (s[i] > s[i - 1]) & (s[i] > s[i + 1])
+        else:
+            for i in range(lo, hi):
+                k += (s[i] > s[i - 1] + threshold) & (s[i] > s[i + 1] + threshold)
+        counts[c + 1] = k
+
+    offsets = np.cumsum(counts)
+    out = np.empty(offsets[-1], dtype=np.intp)
+
+    for c in prange(n_chunks):
+        lo = max(1, c * chunk)
+        hi = min(n - 1, (c + 1) * chunk)
+        k = offsets[c]
+        if threshold == 0:
+            for i in range(lo, hi):
+                if s[i] > s[i - 1] and s[i] > s[i + 1]:
+                    out[k] = i
+                    k += 1
+        else:
+            for i in range(lo, hi):
+                if s[i] > s[i - 1] + threshold and s[i] > s[i + 1] + threshold:
+                    out[k] = i
+                    k += 1
+
+    return out
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def enforce_min_distance(peaks, min_distance):
+    """
+    Greedily drop peaks closer than `min_distance` to the last kept peak.
+
+    Parameters
+    ----------
+    peaks : ndarray
+        Indices of the peaks in ascending order.
+    min_distance : int
+        Minimum number of samples between kept peaks.
+
+    Returns
+    -------
+    peaks_filtered : ndarray
+        Indices of the kept peaks in ascending order.
+    """
+    peaks_filtered = np.empty_like(peaks)
+    if peaks.size == 0:
+        return peaks_filtered
+    peaks_filtered[0] = peaks[0]
+    k = 1  # Pointer to the end of valid area in `peaks_filtered`
+    for i in range(1, peaks.size):
+        if peaks[i] - peaks_filtered[k - 1] >= min_distance:
+            peaks_filtered[k] = peaks[i]
+            k += 1
+    return peaks_filtered[:k]
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def peak_prominences(s, peaks):
+    """
+    Compute the prominence of every peak.
+
+    Each side of a peak is walked out while the signal keeps rising away
+    from it, and the prominence is the peak height minus the higher of the
+    two minima met on the way.
+
+    Peaks are swept in order on each side. A walk that reaches the
+    neighbouring peak continues exactly like that peak's own walk, so it
+    reuses the stored minimum and base instead of reading the samples
+    again. Every sample is then read at most once per side, even when runs
+    hold many peaks, e.g. plateaus with a negative threshold.
+
+    Parameters
+    ----------
+    s : ndarray
+        The 1D signal.
+    peaks : ndarray
+        Indices of the peaks in `s` in ascending order.
+
+    Returns
+    -------
+    prominences : ndarray
+        Prominence of each peak in `peaks`.
+    """
+    n_peaks = peaks.size
+    left_mins = np.empty(n_peaks, dtype=s.dtype)
+    left_bases = np.empty(n_peaks, dtype=np.intp)
+    right_mins = np.empty(n_peaks, dtype=s.dtype)
+    right_bases = np.empty(n_peaks, dtype=np.intp)
+
+    for k in range(n_peaks):
+        peak = peaks[k]
+        left_base = peak
+        left_min = s[peak]
+        while left_base > 0 and s[left_base] <= s[left_base - 1]:
+            left_base -= 1
+            if k > 0 and left_base == peaks[k - 1]:
+                if left_mins[k - 1] < left_min:
+                    left_min = left_mins[k - 1]
+                left_base = left_bases[k - 1]
+                break
+            if s[left_base] < left_min:
+                left_min = s[left_base]
+        left_mins[k] = left_min
+        left_bases[k] = left_base
+
+    for k in range(n_peaks - 1, -1, -1):
+        peak = peaks[k]
+        right_base = peak
+        right_min = s[peak]
+        while right_base < s.size - 1 and s[right_base] <= s[right_base + 1]:
+            right_base += 1
+            if k < n_peaks - 1 and right_base == peaks[k + 1]:
+                if right_mins[k + 1] < right_min:
+                    right_min = right_mins[k + 1]
+                right_base = right_bases[k + 1]
+                break
+            if s[right_base] < right_min:
+                right_min = s[right_base]
+        right_mins[k] = right_min
+        right_bases[k] = right_base
+
+    prominences = np.empty(n_peaks, dtype=np.float64)
+    for k in range(n_peaks):
+        prominences[k] = s[peaks[k]] - max(left_mins[k], right_mins[k])
+    return prominences
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def _count_at_or_below(stack_vals, top, level):
+    # Number of entries of the increasing stack_vals[:top] that are <= level
+    lo = 0
+    hi = top
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if stack_vals[mid] <= level:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def peak_widths(s, peaks, threshold):
+    """
+    Compute the width of every peak.
+
+    The width is the number of samples between the first samples on each
+    side of the peak that drop to half the sum of the peak height and
+    `threshold`.
+
+    Rather than walking out from every peak, which is quadratic when half
+    heights sit below most of the signal (e.g. a signal with a DC offset),
+    each side is resolved in one sweep. The sweep keeps a stack of the
+    samples that are lower than everything after them, so the stack values
+    increase from bottom to top. The last sample at or below a given level
+    is then the topmost stack entry at or below it, found by binary search.
+
+    The price is memory: each sweep allocates an index and a value stack of
+    16 bytes per sample it covers, i.e. ``peaks[-1] + 1`` samples for the
+    left sweep and ``s.size - peaks[0]`` for the right one, where the walks
+    needed no extra memory.
+
+    Parameters
+    ----------
+    s : ndarray
+        The 1D signal.
+    peaks : ndarray
+        Indices of the peaks in `s` in ascending order.
+    threshold : float
+        Detection threshold used to compute the reference height.
+
+    Returns
+    -------
+    widths : ndarray
+        Width of each peak in `peaks`.
+    """
+    n_peaks = peaks.size
+    left_edges = np.empty(n_peaks, dtype=np.intp)
+    widths = np.empty(n_peaks, dtype=np.intp)
+    if n_peaks == 0:
+        return widths
+
+    # Left edges: sweep forward up to the last peak
+    stack = np.empty(peaks[-1] + 1, dtype=np.intp)
+    stack_vals = np.empty(peaks[-1] + 1, dtype=np.float64)
+    top = 0
+    k = 0
+    for i in range(peaks[-1] + 1):
+        # NaN stops a walk like any sample at or below half height
+        value = -np.inf if np.isnan(s[i]) else s[i]
+        while top > 0 and stack_vals[top - 1] >= value:
+            top -= 1
+        stack[top] = i
+        stack_vals[top] = value
+        top += 1
+        if i == peaks[k]:
+            half_height = (s[i] + threshold) / 2
+            count = _count_at_or_below(stack_vals, top, half_height)
+            left_edges[k] = stack[count - 1] if count > 0 else 0
+            k += 1
+
+    # Right edges: sweep backward down to the first peak
+    stack = np.empty(s.size - peaks[0], dtype=np.intp)
+    stack_vals = np.empty(s.size - peaks[0], dtype=np.float64)
+    top = 0
+    k = n_peaks - 1
+    for i in range(s.size - 1, peaks[0] - 1, -1):
+        value = -np.inf if np.isnan(s[i]) else s[i]
+        while top > 0 and stack_vals[top - 1] >= value:
+            top -= 1
+        stack[top] = i
+        stack_vals[top] = value
+        top += 1
+        if i == peaks[k]:
+            half_height = (s[i] + threshold) / 2
+            count = _count_at_or_below(stack_vals, top, half_height)
+            right_edge = stack[count - 1] if count > 0 else s.size - 1
+            widths[k] = right_edge - left_edges[k]
+            k -= 1
+
+    return widths
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def _ring_peak_prominence(buffer, buffer_index, position, value):
+    # Split the ring buffer at the peak into the samples received before it
+    # (from the oldest slot at buffer_index) and after it, and measure the
+    # peak against the higher of the two minima. An empty side counts as the
+    # peak value itself.
+    size = buffer.size
+    peak_index = position % size
+
+    left_min = np.inf
+    i = buffer_index
+    while i != peak_index:
+        if buffer[i] < left_min:
+            left_min = buffer[i]
+        i = (i + 1) % size
+    if buffer_index == peak_index:
+        left_min = value
+
+    right_min = np.inf
+    i = (peak_index + 1) % size
+    while i != buffer_index:
+        if buffer[i] < right_min:
+            right_min = buffer[i]
+        i = (i + 1) % size
+    if (peak_index + 1) % size == buffer_index:
+        right_min = value
+
+    return value - max(left_min, right_min)
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def _ring_peak_width(buffer, position, value, threshold):
+    # Walk out from the peak around the ring buffer until the signal drops to
+    # half height, stopping if the walk wraps back onto the peak
+    size = buffer.size
+    half_height = (value + threshold) / 2
+    peak_index = position % size
+    left = right = peak_index
+
+    while buffer[left] > half_height:
+        left = (left - 1) % size
+        if left == peak_index:
+            break
+
+    while buffer[right] > half_height:
+        right = (right + 1) % size
+        if right == peak_index:
+            break
+
+    if right > left:
+        return right - left
+    else:
+        return size - left + right
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def process_block(
+    buffer,
+    buffer_index,
+    sample_count,
+    prev2,
+    prev1,
+    potential_peaks_pos,
+    potential_peaks_val,
+    potential_peaks_head,
+    potential_peaks_tail,
+    samples,
+    threshold,
+    min_distance,
+    prominence,
+    width,
+    last_confirmed,
+    confirmed_pos,
+    confirmed_val,
+):
+    """
+    Feed a block of samples through the streaming peak detector state.
+
+    This is the compiled counterpart of calling
+    `PeakDetectorSingleSample.add_sample` once per sample: the ring buffer
+    and the potential peak queue are updated in place, and every peak
+    confirmed along the way is written to `confirmed_pos` and
+    `confirmed_val`.
+
+    Parameters
+    ----------
+    buffer : ndarray
+        Ring buffer of recent samples, updated in place.
+    buffer_index : int
+        Position of the next write into `buffer`.
+    sample_count : int
+        Number of samples processed before this block.
+    prev2, prev1 : float
+        The two most recent samples before this block, oldest first.
+    potential_peaks_pos, potential_peaks_val : ndarray
+        Ring queue of potential peak positions and values, updated in place.
+    potential_peaks_head, potential_peaks_tail : int
+        Bounds of the pending entries in the potential peak queue.
+    samples : ndarray
+        The block of new samples.
+    threshold : float
+        Minimum height difference for peak detection.
+    min_distance, prominence, width : float
+        Confirmation criteria, each disabled when 0.
+    last_confirmed : int
+        Position of the last confirmed peak, or -1 if there is none.
+    confirmed_pos, confirmed_val : ndarray
+        Output buffers for the newly confirmed peaks. They must be able to
+        hold ``samples.size + buffer.size`` entries.
+
+    Returns
+    -------
+    buffer_index, sample_count : int
+        Updated buffer position and sample counter.
+    prev2, prev1 : float
+        The two most recent samples, oldest first.
+    potential_peaks_head, potential_peaks_tail : int
+        Updated bounds of the potential peak queue.
+    n_confirmed : int
+        Number of peaks written to `confirmed_pos` and `confirmed_val`.
+    """
+    size = buffer.size
+    n_confirmed = 0
+
+    for j in range(samples.size):
+        sample_count += 1
+        sample = samples[j]
+
+        # Add the new sample to the buffer
+        buffer[buffer_index] = sample
+        buffer_index = (buffer_index + 1) % size
+
+        # Check for potential peak
+        if sample_count >= 3:
+            if prev1 > prev2 + threshold and prev1 > sample + threshold:
+                slot = potential_peaks_tail % size
+                potential_peaks_pos[slot] = sample_count - 2
+                potential_peaks_val[slot] = prev1
+                potential_peaks_tail += 1
+        prev2, prev1 = prev1, sample
+
+        # Process potential peaks
+        if sample_count < size:
+            continue
+        while potential_peaks_head < potential_peaks_tail:
+            slot = potential_peaks_head % size
+            position = potential_peaks_pos[slot]
+            value = potential_peaks_val[slot]
+            if sample_count - position < size // 2:
+                break
+            potential_peaks_head += 1
+
+            if (
+                min_distance != 0
+                and last_confirmed >= 0
+                and position - last_confirmed < min_distance
+            ):
+                continue
+            if (
+                prominence != 0
+                and _ring_peak_prominence(buffer, buffer_index, position, value)
+                < prominence
+            ):
+                continue
+            if width != 0 and _ring_peak_width(buffer, position, value, threshold) < width:
+                continue
+
+            confirmed_pos[n_confirmed] = position
+            confirmed_val[n_confirmed] = value
+            n_confirmed += 1
+            last_confirmed = position
+
+    return (
+        buffer_index,
+        sample_count,
+        prev2,
+        prev1,
+        potential_peaks_head,
+        potential_peaks_tail,
+        n_confirmed,
+    )
@@ -1,6 +1,11 @@
+import numpy as np
+
+from peak_kernels import _ring_peak_prominence, process_block
+
+
 class PeakDetectorSingleSample:
     """
-    A class for real-time peak detection in streaming data using basic Python constructs.
+    A class for real-time peak detection in streaming data using NumPy ring buffers.
 
     This class implements an online algorithm for detecting peaks in a continuous
     stream of data samples. It maintains a fixed-size buffer of recent samples
@@ -31,9 +36,17 @@ class PeakDetectorSingleSample:
         self.prominence = prominence
         self.width = width
         
-        self.buffer = [0] * buffer_size  # Fixed-size buffer initialized with zeros
+        self.buffer = np.zeros(buffer_size, dtype=np.float64)  # Fixed-size buffer initialized with zeros
         self.buffer_index = 0  # Current position in the buffer
-        self.potential_peaks = []  # List to store potential peaks
+        # The two most recent samples, kept apart from the buffer for the peak check
+        self._prev2 = 0.0
+        self._prev1 = 0.0
+        # Queue of potential peaks, stored as parallel position and value arrays.
+        # Pending peaks always lie within the last buffer_size samples.
+        self.potential_peaks_pos = np.empty(buffer_size, dtype=np.int64)
+        self.potential_peaks_val = np.empty(buffer_size, dtype=np.float64)
+        self.potential_peaks_head = 0  # Index of the oldest potential peak
+        self.potential_peaks_tail = 0  # Index one past the newest potential peak
         self.confirmed_peaks = []  # List to store confirmed peaks
         self.sample_count = 0  # Counter for the total number of samples processed
 
@@ -51,6 +64,7 @@ class PeakDetectorSingleSample:
             list: The current list of confirmed peaks.
         """
         self.sample_count += 1
+        sample = float(sample)
         
         # Add the new sample to the buffer
         self.buffer[self.buffer_index] = sample
@@ -58,7 +72,8 @@ class PeakDetectorSingleSample:
 
         # Check for potential peak
         if self.sample_count >= 3:
-            self._check_potential_peak()
+            self._check_potential_peak(sample)
+        self._prev2, self._prev1 = self._prev1, sample
 
         # Process potential peaks
         if self.sample_count >= self.buffer_size:
@@ -66,20 +81,73 @@ class PeakDetectorSingleSample:
 
         return self.confirmed_peaks
 
-    def _check_potential_peak(self):
+    def add_samples(self, samples):
+        """
+        Process a block of samples, updating peak detection.
+
+        This is equivalent to calling `add_sample` for each sample in order,
+        but runs the whole block in a compiled kernel.
+
+        Args:
+            samples (array_like): The new data samples to process.
+
+        Returns:
+            list: The current list of confirmed peaks.
+        """
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        confirmed_pos = np.empty(samples.size + self.buffer_size, dtype=np.int64)
+        confirmed_val = np.empty(samples.size + self.buffer_size, dtype=np.float64)
+        last_confirmed = self.confirmed_peaks[-1][0] if self.confirmed_peaks else -1
+
+        (
+            self.buffer_index,
+            self.sample_count,
+            self._prev2,
+            self._prev1,
+            self.potential_peaks_head,
+            self.potential_peaks_tail,
+            n_confirmed,
+        ) = process_block(
+            self.buffer,
+            self.buffer_index,
+            self.sample_count,
+            self._prev2,
+            self._prev1,
+            self.potential_peaks_pos,
+            self.potential_peaks_val,
+            self.potential_peaks_head,
+            self.potential_peaks_tail,
+            samples,
+            float(self.threshold),
+            float(self.min_distance or 0),
+            float(self.prominence or 0),
+            float(self.width or 0),
+            last_confirmed,
+            confirmed_pos,
+            confirmed_val,
+        )
+
+        self.confirmed_peaks.extend(
+            zip(confirmed_pos[:n_confirmed].tolist(), confirmed_val[:n_confirmed].tolist())
+        )
+        return self.confirmed_peaks
+
+    def _check_potential_peak(self, sample):
         """
-        Check if the second-to-last sample in the buffer is a potential peak.
+        Check if the previous sample is a potential peak.
 
         A sample is considered a potential peak if it's higher than both its
         neighbors by at least the threshold value.
-        """
-        current_index = (self.buffer_index - 2) % self.buffer_size
-        prev_index = (current_index - 1) % self.buffer_size
-        next_index = (current_index + 1) % self.buffer_size
 
-        if (self.buffer[current_index] > self.buffer[prev_index] + self.threshold and
-            self.buffer[current_index] > self.buffer[next_index] + self.threshold):
-            self.potential_peaks.append((self.sample_count - 2, self.buffer[current_index]))
+        Args:
+            sample (float): The newest sample, right neighbor of the candidate.
+        """
+        if (self._prev1 > self._prev2 + self.threshold and
+            self._prev1 > sample + self.threshold):
+            slot = self.potential_peaks_tail % self.buffer_size
+            self.potential_peaks_pos[slot] = self.sample_count - 2
+            self.potential_peaks_val[slot] = self._prev1
+            self.potential_peaks_tail += 1
 
     def _process_potential_peaks(self):
         """
@@ -87,16 +155,18 @@ class PeakDetectorSingleSample:
 
         This method checks potential peaks that are now in the middle of the buffer,
         applying additional criteria (min_distance, prominence, width) to confirm
-        them as actual peaks.
+        them as actual peaks. Peaks are queued in order of position, so only the
+        oldest ones can be ready.
         """
-        new_potential_peaks = []
-        for peak in self.potential_peaks:
-            if self.sample_count - peak[0] >= self.buffer_size // 2:
-                if self._check_peak_validity(peak):
-                    self.confirmed_peaks.append(peak)
-            else:
-                new_potential_peaks.append(peak)
-        self.potential_peaks = new_potential_peaks
+        while self.potential_peaks_head < self.potential_peaks_tail:
+            slot = self.potential_peaks_head % self.buffer_size
+            position = int(self.potential_peaks_pos[slot])
+            if self.sample_count - position < self.buffer_size // 2:
+                break
+            peak = (position, float(self.potential_peaks_val[slot]))
+            if self._check_peak_validity(peak):
+                self.confirmed_peaks.append(peak)
+            self.potential_peaks_head += 1
 
     def _check_peak_validity(self, peak):
         """
@@ -130,6 +200,10 @@ class PeakDetectorSingleSample:
         Calculate the prominence of a peak.
 
         Prominence is the vertical distance between the peak and its lowest contour line.
+        The buffer is split at the peak into the samples received before and after
+        it, and the contour line is the higher of the two sides' minima. A side with
+        no samples left in the buffer does not lower the contour line, and NaN
+        samples are skipped. This shares its kernel with `add_samples`.
 
         Args:
             peak (tuple): A tuple containing (peak_position, peak_value).
@@ -137,10 +211,7 @@ class PeakDetectorSingleSample:
         Returns:
             float: The calculated prominence of the peak.
         """
-        peak_index = peak[0] % self.buffer_size
-        left_min = min(self.buffer[peak_index:] + self.buffer[:peak_index])
-        right_min = min(self.buffer[peak_index:] + self.buffer[:peak_index])
-        return peak[1] - max(left_min, right_min)
+        return _ring_peak_prominence(self.buffer, self.buffer_index, peak[0], peak[1])
 
     def _calculate_width(self, peak):
         """
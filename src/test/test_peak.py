@@ -1,15 +1,24 @@
+import copy
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from peak import PeakDetector
+from peak_kernels import (
+    _ring_peak_prominence,
+    find_local_maxima_parallel,
+    local_maxima_mask,
+    peak_prominences,
+    peak_widths,
+)
+from peak_single_sample import PeakDetectorSingleSample
+import numpy as np
 import pytest
-from scipy.datasets import electrocardiogram
-import matplotlib.pyplot as plt
-from scipy.signal import find_peaks
 
 
 def plot_peaks(signal, custom_peaks, scipy_peaks=None):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 6))
 
     # Plot the signal
@@ -30,9 +39,238 @@ def plot_peaks(signal, custom_peaks, scipy_peaks=None):
     plt.show()
 
 
+def test_detect_peaks_filters_peaks_with_properties():
+    signal = np.array([0.0, 1.0, 0.0, 5.0, 4.0, 5.0, 0.0, 0.0, 3.0, 0.0])
+    detector = PeakDetector(signal=signal, prominence=0, width=3)
+
+    peaks, props = detector.detect_peaks()
+
+    assert len(peaks) == len(props["heights"])
+    np.testing.assert_array_equal(peaks, [3, 5])
+    np.testing.assert_array_equal(props["heights"], [5.0, 5.0])
+    np.testing.assert_array_equal(props["prominences"], [0.0, 0.0])
+    np.testing.assert_array_equal(props["widths"], [4, 4])
+
+
+def test_detect_peaks_unrequested_properties_are_none():
+    signal = np.array([0.0, 1.0, 0.0, 5.0, 4.0, 5.0, 0.0, 0.0, 3.0, 0.0])
+    detector = PeakDetector(signal=signal, width=3)
+
+    peaks, props = detector.detect_peaks()
+
+    np.testing.assert_array_equal(peaks, [3, 5])
+    assert props["prominences"] is None
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int16])
+def test_detect_peaks_narrow_dtype(dtype):
+    signal = np.array([0, 1, 0, 5, 4, 5, 0, 0, 3, 0])
+    detector = PeakDetector(signal=signal, width=3, dtype=dtype)
+
+    peaks, _ = detector.detect_peaks()
+
+    assert detector.signal.dtype == dtype
+    np.testing.assert_array_equal(peaks, [3, 5])
+
+
+def test_detect_peaks_rejects_unsupported_dtype():
+    with pytest.raises(ValueError):
+        PeakDetector(signal=np.zeros(10), dtype=np.float16)
+
+
+@pytest.mark.parametrize(
+    "signal",
+    [
+        np.array([0, 1, 0, 5, 4, 5, 0, 0, 3, 0], dtype=np.float16),
+        np.array([0, 1, 0, 5, 4, 5, 0, 0, 3, 0], dtype=">f8"),
+        np.array([0, 1, 0, 5, 4, 5, 0, 0, 3, 0], dtype=">i2"),
+    ],
+)
+def test_detect_peaks_normalizes_signal_dtype(signal):
+    detector = PeakDetector(signal=signal, width=3)
+
+    peaks, props = detector.detect_peaks()
+
+    np.testing.assert_array_equal(peaks, [3, 5])
+    np.testing.assert_array_equal(props["widths"], [4, 4])
+
+
+def test_detect_peaks_rejects_unsupported_signal_dtype():
+    signal = np.array([0, 1, 0, 5, 4, 5, 0, 0, 3, 0], dtype=object)
+    detector = PeakDetector(signal=signal)
+
+    with pytest.raises(ValueError):
+        detector.detect_peaks()
+
+
+def walk_prominence(signal, peak):
+    left_base = right_base = peak
+    while left_base > 0 and signal[left_base] <= signal[left_base - 1]:
+        left_base -= 1
+    while right_base < len(signal) - 1 and signal[right_base] <= signal[right_base + 1]:
+        right_base += 1
+    left_min = min(signal[left_base : peak + 1])
+    right_min = min(signal[peak : right_base + 1])
+    return signal[peak] - max(left_min, right_min)
+
+
+def walk_width(signal, peak, threshold):
+    half_height = (signal[peak] + threshold) / 2
+    left_idx = right_idx = peak
+    while left_idx > 0 and signal[left_idx] > half_height:
+        left_idx -= 1
+    while right_idx < len(signal) - 1 and signal[right_idx] > half_height:
+        right_idx += 1
+    return right_idx - left_idx
+
+
+def find_candidate_peaks(signal, threshold):
+    mask = local_maxima_mask(signal, threshold, np.zeros(signal.size, dtype=np.bool_))
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.5, -0.5, -1.5])
+def test_peak_prominences_match_per_peak_walk(threshold):
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        # Small integers give plateaus, where neighbouring walks are reused
+        signal = rng.integers(0, 4, size=rng.integers(3, 60)).astype(float)
+        peaks = find_candidate_peaks(signal, threshold)
+
+        prominences = peak_prominences(signal, peaks)
+
+        expected = [walk_prominence(signal, peak) for peak in peaks]
+        np.testing.assert_array_equal(prominences, expected)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.5, -0.5, -3.0])
+def test_peak_widths_match_per_peak_walk(threshold):
+    rng = np.random.default_rng(4)
+    signals = []
+    for _ in range(20):
+        signals.append(rng.normal(size=80))
+        # DC offset puts half heights below most of the signal
+        signals.append(10.0 + rng.normal(size=80))
+        with_nan = rng.normal(size=80)
+        with_nan[rng.integers(0, 80, size=8)] = np.nan
+        signals.append(with_nan)
+        # Peaks right next to both ends
+        near_ends = 10.0 + rng.normal(size=80)
+        near_ends[[0, -1]] = 0.0
+        near_ends[[1, -2]] = 20.0
+        signals.append(near_ends)
+
+    for signal in signals:
+        peaks = find_candidate_peaks(signal, threshold)
+
+        widths = peak_widths(signal, peaks, threshold)
+
+        expected = [walk_width(signal, peak, threshold) for peak in peaks]
+        np.testing.assert_array_equal(widths, expected)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.3, -0.2])
+@pytest.mark.parametrize("n_chunks", [1, 3, 7, 200])
+def test_parallel_local_maxima_matches_mask(n_chunks, threshold):
+    rng = np.random.default_rng(2)
+    for signal in (rng.normal(size=101), rng.integers(0, 3, size=101).astype(float)):
+        expected = np.flatnonzero(
+            local_maxima_mask(signal, threshold, np.zeros(signal.size, dtype=np.bool_))
+        )
+
+        peaks = find_local_maxima_parallel(signal, threshold, n_chunks)
+
+        np.testing.assert_array_equal(peaks, expected)
+
+
+def test_add_samples_matches_add_sample():
+    rng = np.random.default_rng(0)
+    signal = np.sin(np.linspace(0, 40, 3000)) + 0.2 * rng.normal(size=3000)
+    # NaN samples must be handled the same way by both entry points
+    signal[rng.integers(0, signal.size, size=30)] = np.nan
+    params = dict(buffer_size=50, threshold=0.05, min_distance=5, prominence=0.5, width=3)
+
+    per_sample = PeakDetectorSingleSample(**params)
+    for sample in signal:
+        per_sample.add_sample(sample)
+
+    batched = PeakDetectorSingleSample(**params)
+    for block in np.split(signal, [7, 500, 501, 1800]):
+        batched.add_samples(block)
+
+    # Alternate between both entry points on the same detector
+    mixed = PeakDetectorSingleSample(**params)
+    for i, block in enumerate(np.split(signal, range(10, signal.size, 10))):
+        if i % 2:
+            mixed.add_samples(block)
+        else:
+            for sample in block:
+                mixed.add_sample(sample)
+
+    assert len(per_sample.get_peaks()) > 0
+    assert batched.get_peaks() == per_sample.get_peaks()
+    assert mixed.get_peaks() == per_sample.get_peaks()
+
+
+@pytest.mark.parametrize(
+    "position, value, expected",
+    [
+        # Slot 7 precedes the wrap: left is slots 5-6, right is slots 0-4
+        (15, 8.0, 8.0 - 2.0),
+        # Slot 1 follows the wrap: left is slots 5-7 and 0, right is slots 2-4
+        (17, 9.0, 9.0 - 4.0),
+    ],
+)
+def test_streaming_prominence_splits_ring_buffer_at_peak(position, value, expected):
+    detector = PeakDetectorSingleSample(buffer_size=8)
+    detector.buffer[:] = [2.0, 9.0, 4.0, 6.0, 5.0, 1.0, 3.0, 8.0]
+    detector.buffer_index = 5  # Slot of the oldest sample
+
+    assert detector._calculate_prominence((position, value)) == expected
+    assert _ring_peak_prominence(detector.buffer, detector.buffer_index, position, value) == expected
+
+
+def test_add_samples_matches_add_sample_with_nan_in_buffer():
+    signal = np.zeros(40)
+    signal[[1, 5, 7, 9]] = [1.0, 5.0, 1.0, 2.0]
+    signal[3] = np.nan
+    params = dict(buffer_size=8, prominence=3.0)
+
+    per_sample = PeakDetectorSingleSample(**params)
+    for sample in signal:
+        per_sample.add_sample(sample)
+
+    batched = PeakDetectorSingleSample(**params)
+    batched.add_samples(signal)
+
+    assert per_sample.get_peaks() == [(5, 5.0)]
+    assert batched.get_peaks() == per_sample.get_peaks()
+
+
+def test_streaming_detector_copy_is_independent():
+    rng = np.random.default_rng(1)
+    signal = rng.normal(size=400)
+    params = dict(buffer_size=20, min_distance=3, prominence=0.5, width=2)
+
+    original = PeakDetectorSingleSample(**params)
+    for sample in signal[:100]:
+        original.add_sample(sample)
+    copied = copy.deepcopy(original)
+
+    for detector in (original, copied):
+        for sample in signal[100:250]:
+            detector.add_sample(sample)
+        detector.add_samples(signal[250:])
+
+    assert not np.shares_memory(original.buffer, copied.buffer)
+    assert copied.get_peaks() == original.get_peaks()
+
+
 
 if __name__ == "__main__":
     # pytest.main()
+    from scipy.datasets import electrocardiogram
+    from scipy.signal import find_peaks
 
     # Use the ECG signal from the scipy package
     signal = electrocardiogram()